@@ -6,10 +6,12 @@
 # Versão: 2.0 (compatível com Streamlit)
 # ==========================================================
 
+import os
 from fastapi import FastAPI
 from pydantic import BaseModel
 from ai_fraud import treinar_modelo, analisar_transacao
 from blockchain import Blockchain
+from sincronizacao import criar_router
 from fastapi.middleware.cors import CORSMiddleware
 
 # ==========================================================
@@ -41,6 +43,15 @@ except Exception as e:
     print("⚠️ Erro ao inicializar modelo ou blockchain:", e)
     modelo, encoders, blockchain = None, None, None
 
+# Endpoints de sincronização entre nós (/sync/...), só montados com token.
+# SMARTFIN_SYNC_TOKEN: segredo compartilhado entre os nós (cabeçalho X-Sync-Token)
+# SMARTFIN_PEERS: URLs autorizadas a sobrescrever a cadeia, separadas por vírgula
+token_sync = os.getenv("SMARTFIN_SYNC_TOKEN")
+if blockchain and token_sync:
+    app.include_router(
+        criar_router(blockchain, token_sync, os.getenv("SMARTFIN_PEERS", "").split(","))
+    )
+
 # ==========================================================
 # 🧾 Modelo de entrada da transação
 # ==========================================================
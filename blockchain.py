@@ -6,17 +6,26 @@
 # ==========================================================
 
 import hashlib
+import threading
 import time
 import json
 from datetime import datetime
 
+# Campos do cabeçalho: tudo que a sincronização precisa para validar
+# ligação e Proof of Work antes de baixar o corpo (transacao/risco).
+CAMPOS_CABECALHO = ("index", "timestamp", "hash_anterior", "hash", "nonce")
+
+# Gênese fixo: todo nó com a mesma dificuldade parte da mesma raiz,
+# o que permite à sincronização achar um ancestral comum
+TIMESTAMP_GENESIS = "2025-01-01 00:00:00"
+
 # ==========================================================
 # 🧱 CLASSE BLOCO
 # ==========================================================
 class Bloco:
-    def __init__(self, index, transacao, risco, hash_anterior, dificuldade=4):
+    def __init__(self, index, transacao, risco, hash_anterior, dificuldade=4, timestamp=None):
         self.index = index
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.transacao = transacao
         self.risco = risco
         self.hash_anterior = hash_anterior
@@ -62,6 +71,23 @@ class Bloco:
             "nonce": self.nonce,
         }
 
+    # Cabeçalho do bloco (sem transação/risco) para a sincronização
+    def cabecalho(self):
+        return {campo: getattr(self, campo) for campo in CAMPOS_CABECALHO}
+
+    # Reconstrói um bloco já minerado a partir do dicionário (sem minerar de novo)
+    @classmethod
+    def de_dict(cls, dados):
+        bloco = cls.__new__(cls)
+        bloco.index = dados["index"]
+        bloco.timestamp = dados["timestamp"]
+        bloco.transacao = dados["transacao"]
+        bloco.risco = dados["risco"]
+        bloco.hash_anterior = dados["hash_anterior"]
+        bloco.nonce = dados["nonce"]
+        bloco.hash = dados["hash"]
+        return bloco
+
 
 # ==========================================================
 # 🔗 CLASSE BLOCKCHAIN
@@ -70,20 +96,25 @@ class Blockchain:
     def __init__(self, dificuldade=4):
         self.cadeia = []
         self.dificuldade = max(2, dificuldade)
+        # Serializa mineração/adição de blocos e a troca feita pela sincronização
+        self._trava = threading.Lock()
         self.criar_bloco_genesis()
 
     # Primeiro bloco da cadeia
     def criar_bloco_genesis(self):
-        bloco_genesis = Bloco(0, "Transação inicial", "Seguro", "0", self.dificuldade)
+        bloco_genesis = Bloco(
+            0, "Transação inicial", "Seguro", "0", self.dificuldade, TIMESTAMP_GENESIS
+        )
         self.cadeia.append(bloco_genesis)
 
     # Adiciona novo bloco (transação analisada pela IA)
     def adicionar_bloco(self, transacao, risco):
-        ultimo_bloco = self.cadeia[-1]
-        novo_bloco = Bloco(
-            len(self.cadeia), transacao, risco, ultimo_bloco.hash, self.dificuldade
-        )
-        self.cadeia.append(novo_bloco)
+        with self._trava:
+            ultimo_bloco = self.cadeia[-1]
+            novo_bloco = Bloco(
+                len(self.cadeia), transacao, risco, ultimo_bloco.hash, self.dificuldade
+            )
+            self.cadeia.append(novo_bloco)
 
     # Verifica integridade da cadeia
     def verificar_integridade(self):
@@ -102,9 +133,97 @@ class Blockchain:
         print("✅ Blockchain íntegra — nenhuma alteração detectada.\n")
         return True
 
+    # ======================================================
+    # 🌐 Suporte à sincronização entre nós
+    # ======================================================
+
+    # Trabalho esperado de um bloco: 16^dificuldade hashes (dígitos hex zerados)
+    @staticmethod
+    def trabalho_por_bloco(dificuldade):
+        return 16 ** dificuldade
+
+    # Trabalho acumulado da cadeia inteira (critério de escolha entre forks).
+    # A sincronização só aceita peers com a mesma dificuldade, então todo
+    # bloco da cadeia vale o mesmo trabalho.
+    def trabalho_acumulado(self):
+        return len(self.cadeia) * self.trabalho_por_bloco(self.dificuldade)
+
+    # Localizador de blocos: hashes do topo para trás, com passo dobrando,
+    # sempre terminando no gênesis (O(log n) entradas)
+    def localizador(self):
+        localizador = []
+        i = len(self.cadeia) - 1
+        passo = 1
+        while i > 0:
+            localizador.append({"index": i, "hash": self.cadeia[i].hash})
+            if len(localizador) >= 10:
+                passo *= 2
+            i -= passo
+        localizador.append({"index": 0, "hash": self.cadeia[0].hash})
+        return localizador
+
+    # Maior índice do localizador que também existe nesta cadeia (-1 se nenhum)
+    def ancestral_comum(self, localizador):
+        for entrada in localizador:
+            i = entrada["index"]
+            if 0 <= i < len(self.cadeia) and self.cadeia[i].hash == entrada["hash"]:
+                return i
+        return -1
+
+    def cabecalhos(self, inicio, limite):
+        return [bloco.cabecalho() for bloco in self.cadeia[inicio:inicio + limite]]
+
+    def blocos(self, inicio, fim):
+        return [bloco.to_dict() for bloco in self.cadeia[inicio:fim]]
+
+    # Valida cabeçalhos contra o anterior: índice, ligação e alvo do PoW.
+    # O hash só é recalculado quando o corpo chegar (validar_corpo).
+    @staticmethod
+    def validar_cabecalhos(cabecalhos, anterior, dificuldade):
+        alvo = "0" * dificuldade
+        for cab in cabecalhos:
+            if anterior is None:
+                if cab["index"] != 0 or cab["hash_anterior"] != "0":
+                    return False
+            elif cab["index"] != anterior["index"] + 1 or cab["hash_anterior"] != anterior["hash"]:
+                return False
+            if not cab["hash"].startswith(alvo):
+                return False
+            anterior = cab
+        return True
+
+    # Confere se o corpo recebido corresponde ao cabeçalho já validado
+    @staticmethod
+    def validar_corpo(dados, cabecalho):
+        if any(dados[campo] != cabecalho[campo] for campo in CAMPOS_CABECALHO):
+            return None
+        bloco = Bloco.de_dict(dados)
+        if bloco.gerar_hash() != cabecalho["hash"]:
+            return None
+        return bloco
+
+    # Troca a cadeia a partir do ancestral comum pelos blocos do peer.
+    # Sob a trava, confere de novo o ancestral e o trabalho (a cadeia local
+    # pode ter crescido durante o download). Retorna quantos blocos locais
+    # foram descartados.
+    def substituir_a_partir_de(self, ancestral, hash_ancestral, novos_blocos):
+        with self._trava:
+            if ancestral >= 0 and (
+                ancestral >= len(self.cadeia) or self.cadeia[ancestral].hash != hash_ancestral
+            ):
+                raise ValueError("Cadeia local mudou no ancestral durante a sincronização.")
+            # Mesma dificuldade dos dois lados: mais blocos = mais trabalho
+            descartados = len(self.cadeia) - ancestral - 1
+            if len(novos_blocos) <= descartados:
+                raise ValueError("Cadeia local já tem mais trabalho acumulado.")
+            self.cadeia[ancestral + 1:] = novos_blocos
+            return descartados
+
     # Exporta blockchain para arquivo JSON
     def salvar_em_json(self, caminho="data/chain.json"):
-        dados = [bloco.to_dict() for bloco in self.cadeia]
+        with self._trava:
+            cadeia = list(self.cadeia)
+        dados = [bloco.to_dict() for bloco in cadeia]
         with open(caminho, "w", encoding="utf-8") as f:
             json.dump(dados, f, indent=4, ensure_ascii=False)
         print(f"💾 Blockchain salva em {caminho}")
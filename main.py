@@ -5,10 +5,12 @@
 # Descrição: API antifraude + blockchain integrada com IA
 # ==========================================================
 
+import os
 from fastapi import FastAPI
 from pydantic import BaseModel
 from ai_fraud import treinar_modelo, analisar_transacao
 from blockchain import Blockchain
+from sincronizacao import criar_router
 from fastapi.middleware.cors import CORSMiddleware
 
 # ==========================================================
@@ -35,6 +37,15 @@ app.add_middleware(
 modelo, encoders = treinar_modelo()
 blockchain = Blockchain(dificuldade=4)
 
+# Endpoints de sincronização entre nós (/sync/...), só montados com token.
+# SMARTFIN_SYNC_TOKEN: segredo compartilhado entre os nós (cabeçalho X-Sync-Token)
+# SMARTFIN_PEERS: URLs autorizadas a sobrescrever a cadeia, separadas por vírgula
+token_sync = os.getenv("SMARTFIN_SYNC_TOKEN")
+if token_sync:
+    app.include_router(
+        criar_router(blockchain, token_sync, os.getenv("SMARTFIN_PEERS", "").split(","))
+    )
+
 # ==========================================================
 # 🧾 Modelo de entrada da transação
 # ==========================================================
@@ -0,0 +1,321 @@
+# ==========================================================
+# 🌐 SmartFin AI Blockchain - Sincronização entre nós
+# ==========================================================
+# Autor: Claudio Yoshida
+# Descrição: Replicação da blockchain entre APIs (headers-first):
+#            1) localiza o ancestral comum com o peer
+#            2) baixa e valida só os cabeçalhos (ligação + PoW)
+#            3) escolhe o fork pelo trabalho acumulado
+#            4) baixa os corpos em lotes paralelos e confere cada hash
+# ==========================================================
+
+import hmac
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from blockchain import Blockchain
+
+# Limites por requisição (evita respostas gigantes numa cadeia de 100k blocos)
+MAX_CABECALHOS = 2000
+MAX_BLOCOS = 1000
+MAX_PARALELISMO = 16
+
+# Cabeçalho HTTP com o token compartilhado entre os nós
+CABECALHO_TOKEN = "X-Sync-Token"
+
+# Erros de um peer inacessível ou com resposta malformada (URLError/HTTPError
+# e timeouts são OSError; campos ausentes ou de tipo errado caem nos demais)
+ERROS_DE_PEER = (OSError, KeyError, TypeError, AttributeError, IndexError)
+
+
+# ==========================================================
+# 🧾 Modelos de entrada
+# ==========================================================
+class EntradaLocalizador(BaseModel):
+    index: int
+    hash: str
+
+
+class Localizador(BaseModel):
+    localizador: list[EntradaLocalizador]
+
+
+class Peer(BaseModel):
+    url: str
+    lote: int = Field(500, gt=0, le=MAX_BLOCOS)
+    paralelismo: int = Field(4, gt=0, le=MAX_PARALELISMO)
+
+
+def _normalizar_url(url):
+    return url.strip().rstrip("/")
+
+
+# ==========================================================
+# 🛰️ Endpoints servidos por cada nó
+# ==========================================================
+# token: segredo compartilhado exigido em todos os /sync (o ledger tem os
+# dados das transações). peers_permitidos: URLs que /sync/sincronizar pode
+# usar; vazio = nenhuma, pois a sincronização reescreve o ledger local.
+def criar_router(blockchain, token, peers_permitidos=(), caminho="data/chain.json"):
+    if not token:
+        raise ValueError("Token de sincronização não configurado.")
+    peers_permitidos = {_normalizar_url(url) for url in peers_permitidos if url.strip()}
+
+    def verificar_token(x_sync_token: str = Header("")):
+        if not hmac.compare_digest(x_sync_token.encode(), token.encode()):
+            raise HTTPException(status_code=401, detail="Token de sincronização inválido.")
+
+    router = APIRouter(
+        prefix="/sync", tags=["sincronização"], dependencies=[Depends(verificar_token)]
+    )
+
+    @router.get("/status")
+    def status():
+        return {
+            "altura": len(blockchain.cadeia),
+            "dificuldade": blockchain.dificuldade,
+            "trabalho": blockchain.trabalho_acumulado(),
+            "topo": blockchain.cadeia[-1].hash,
+        }
+
+    @router.post("/ancestral")
+    def ancestral(dados: Localizador):
+        entradas = [entrada.model_dump() for entrada in dados.localizador]
+        return {"index": blockchain.ancestral_comum(entradas)}
+
+    @router.get("/cabecalhos")
+    def cabecalhos(inicio: int = 0, limite: int = MAX_CABECALHOS):
+        if inicio < 0 or limite <= 0:
+            raise HTTPException(status_code=400, detail="Intervalo inválido.")
+        return {"cabecalhos": blockchain.cabecalhos(inicio, min(limite, MAX_CABECALHOS))}
+
+    @router.get("/blocos")
+    def blocos(inicio: int, fim: int):
+        if inicio < 0 or fim <= inicio:
+            raise HTTPException(status_code=400, detail="Intervalo inválido.")
+        return {"blocos": blockchain.blocos(inicio, min(fim, inicio + MAX_BLOCOS))}
+
+    @router.post("/sincronizar")
+    def sincronizar(peer: Peer):
+        if _normalizar_url(peer.url) not in peers_permitidos:
+            raise HTTPException(status_code=403, detail="Peer não autorizado.")
+        try:
+            resultado = sincronizar_com_peer(
+                blockchain, peer.url, peer.lote, peer.paralelismo, token=token
+            )
+        except Exception as e:
+            return {"erro": f"Falha ao sincronizar com {peer.url}: {str(e)}"}
+        if resultado["sincronizado"] and resultado["blocos_recebidos"]:
+            blockchain.salvar_em_json(caminho)
+        return resultado
+
+    return router
+
+
+# ==========================================================
+# 🔄 Cliente de sincronização
+# ==========================================================
+def _requisitar(url, corpo=None, timeout=30, token=None):
+    dados = None
+    cabecalhos = {}
+    if token:
+        cabecalhos[CABECALHO_TOKEN] = token
+    if corpo is not None:
+        dados = json.dumps(corpo).encode()
+        cabecalhos["Content-Type"] = "application/json"
+    requisicao = urllib.request.Request(url, data=dados, headers=cabecalhos)
+    with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+        return json.loads(resposta.read())
+
+
+def _baixar_cabecalhos(url, inicio, altura, token):
+    cabecalhos = []
+    while inicio < altura:
+        pagina = _requisitar(
+            f"{url}/sync/cabecalhos?inicio={inicio}&limite={MAX_CABECALHOS}", token=token
+        )["cabecalhos"]
+        if not pagina:
+            break
+        cabecalhos.extend(pagina)
+        inicio += len(pagina)
+    return cabecalhos
+
+
+# Baixa um lote de corpos e já confere cada um contra seu cabeçalho, para
+# que um peer com cabeçalhos forjados seja descartado no primeiro lote
+def _baixar_lote(url, cabecalhos, cancelado, token):
+    inicio, fim = cabecalhos[0]["index"], cabecalhos[-1]["index"] + 1
+    blocos = []
+    try:
+        while inicio < fim:
+            if cancelado.is_set():
+                return None
+            parte = _requisitar(
+                f"{url}/sync/blocos?inicio={inicio}&fim={fim}", token=token
+            )["blocos"]
+            if not parte:
+                raise ValueError(f"Peer não entregou os blocos {inicio}..{fim - 1}.")
+            for dados in parte:
+                cabecalho = cabecalhos[len(blocos)] if len(blocos) < len(cabecalhos) else None
+                bloco = Blockchain.validar_corpo(dados, cabecalho) if cabecalho else None
+                if bloco is None:
+                    raise ValueError(f"Bloco {inicio} não confere com o cabeçalho.")
+                blocos.append(bloco)
+                inicio += 1
+    except Exception:
+        # Avisa os demais workers antes de liberar a thread para o próximo lote
+        cancelado.set()
+        raise
+    return blocos
+
+
+def _baixar_corpos(url, cabecalhos, lote, paralelismo, token):
+    lotes = [cabecalhos[i:i + lote] for i in range(0, len(cabecalhos), lote)]
+    cancelado = threading.Event()
+    with ThreadPoolExecutor(max_workers=paralelismo) as executor:
+        futuros = [
+            executor.submit(_baixar_lote, url, cabs, cancelado, token) for cabs in lotes
+        ]
+        feitos, _ = wait(futuros, return_when=FIRST_EXCEPTION)
+        falhas = [futuro for futuro in feitos if futuro.exception()]
+        if falhas:
+            for futuro in futuros:
+                futuro.cancel()
+            raise falhas[0].exception()
+    return [bloco for futuro in futuros for bloco in futuro.result()]
+
+
+# aceitar_outro_genesis: permite trocar a cadeia inteira (gênese incluso)
+# quando o peer não compartilha nenhum bloco com a cadeia local
+def sincronizar_com_peer(
+    blockchain, url, lote=500, paralelismo=4, token=None, aceitar_outro_genesis=False
+):
+    url = _normalizar_url(url)
+    if urllib.parse.urlparse(url).scheme not in ("http", "https"):
+        raise ValueError("URL do peer deve usar http ou https.")
+    if not 0 < lote <= MAX_BLOCOS or not 0 < paralelismo <= MAX_PARALELISMO:
+        raise ValueError("Parâmetros de lote/paralelismo fora dos limites.")
+    try:
+        return _sincronizar(blockchain, url, lote, paralelismo, token, aceitar_outro_genesis)
+    except ValueError as e:
+        # Bloco que não confere, troca recusada sob a trava ou JSON inválido
+        return {"sincronizado": False, "motivo": str(e)}
+    except ERROS_DE_PEER as e:
+        return {"sincronizado": False, "motivo": f"Peer inacessível ou resposta inválida: {e!r}"}
+
+
+def _sincronizar(blockchain, url, lote, paralelismo, token, aceitar_outro_genesis):
+    inicio_sync = time.time()
+
+    # Só há replicação entre nós de mesma dificuldade: assim o trabalho
+    # acumulado continua sendo altura × 16^dificuldade depois da troca
+    status = _requisitar(f"{url}/sync/status", token=token)
+    if status["dificuldade"] != blockchain.dificuldade:
+        return {"sincronizado": False, "motivo": "Peer usa dificuldade diferente da local."}
+
+    # 1) Ancestral comum via localizador (gêneses diferentes → -1)
+    ancestral = _requisitar(
+        f"{url}/sync/ancestral", {"localizador": blockchain.localizador()}, token=token
+    )["index"]
+    if type(ancestral) is not int or not -1 <= ancestral < len(blockchain.cadeia):
+        return {"sincronizado": False, "motivo": "Ancestral inválido informado pelo peer."}
+    if ancestral == -1 and not aceitar_outro_genesis:
+        return {"sincronizado": False, "motivo": "Peer não compartilha o bloco gênese."}
+    hash_ancestral = blockchain.cadeia[ancestral].hash if ancestral >= 0 else None
+
+    # 2) Headers-first: só cabeçalhos, validados por ligação e alvo do PoW
+    cabecalhos = _baixar_cabecalhos(url, ancestral + 1, status["altura"], token)
+    if not cabecalhos:
+        return {
+            "sincronizado": True,
+            "motivo": "Já sincronizado: o peer não tem blocos novos.",
+            "ancestral": ancestral,
+            "blocos_recebidos": 0,
+            "blocos_descartados": 0,
+            "altura": len(blockchain.cadeia),
+        }
+    anterior = blockchain.cadeia[ancestral].cabecalho() if ancestral >= 0 else None
+    if not Blockchain.validar_cabecalhos(cabecalhos, anterior, blockchain.dificuldade):
+        return {"sincronizado": False, "motivo": "Cabeçalhos inválidos recebidos do peer."}
+
+    # 3) Fork: vence o ramo com mais trabalho acumulado a partir do ancestral
+    # (conferido de novo, sob a trava, no momento da troca)
+    if len(cabecalhos) <= len(blockchain.cadeia) - ancestral - 1:
+        return {"sincronizado": False, "motivo": "Cadeia local já tem mais trabalho acumulado."}
+
+    # 4) Corpos em lotes paralelos, cada lote conferido contra os cabeçalhos
+    novos_blocos = _baixar_corpos(url, cabecalhos, lote, paralelismo, token)
+    descartados = blockchain.substituir_a_partir_de(ancestral, hash_ancestral, novos_blocos)
+
+    duracao = time.time() - inicio_sync
+    return {
+        "sincronizado": True,
+        "ancestral": ancestral,
+        "blocos_recebidos": len(novos_blocos),
+        "blocos_descartados": descartados,
+        "altura": len(blockchain.cadeia),
+        "duracao_s": round(duracao, 3),
+        "blocos_por_segundo": round(len(novos_blocos) / duracao, 1) if duracao else None,
+    }
+
+
+# ==========================================================
+# 🧪 Demonstração local: vários nós no mesmo processo
+# ==========================================================
+# python sincronizacao.py [blocos]
+# Sobe nós em localhost, gera a cadeia no primeiro e sincroniza os demais,
+# reportando a vazão em blocos/s (padrão: catch-up de 100k blocos).
+def _subir_no(blockchain, porta, token, peers_permitidos=(), caminho="data/chain.json"):
+    import uvicorn
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    app.include_router(criar_router(blockchain, token, peers_permitidos, caminho))
+    servidor = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning")
+    )
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import secrets
+    import sys
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    token = secrets.token_hex(16)
+    nos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(3):
+            nos.append(Blockchain(dificuldade=2))
+            time.sleep(1)  # nós criados em momentos diferentes, mesmo gênese
+
+    print(f"⛏️ Gerando {total} blocos no nó 1...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(total):
+            nos[0].adicionar_bloco(f"Transação {i}", "Seguro")
+        nos[2].adicionar_bloco("Fork local do nó 3", "Seguro")
+
+    servidores = [_subir_no(no, 8101 + i, token) for i, no in enumerate(nos)]
+    try:
+        for i in (1, 2):
+            resultado = sincronizar_com_peer(nos[i], "http://127.0.0.1:8101", token=token)
+            print(f"🔄 Nó {i + 1}: {resultado}")
+            if not resultado["sincronizado"] or nos[i].cadeia[-1].hash != nos[0].cadeia[-1].hash:
+                sys.exit(f"❌ Nó {i + 1} não convergiu para a cadeia do nó 1.")
+            if not nos[i].verificar_integridade():
+                sys.exit(f"❌ Cadeia do nó {i + 1} não está íntegra após a sincronização.")
+    finally:
+        for servidor in servidores:
+            servidor.should_exit = True
@@ -0,0 +1,334 @@
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+import blockchain as modulo_blockchain
+import sincronizacao
+from blockchain import Blockchain
+from sincronizacao import _subir_no
+
+TOKEN = "segredo-de-teste"
+
+
+def sincronizar_com_peer(local, url, **kwargs):
+    return sincronizacao.sincronizar_com_peer(local, url, token=TOKEN, **kwargs)
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def subir():
+    servidores = []
+
+    def _subir(blockchain, peers_permitidos=(), caminho="data/chain.json"):
+        porta = _porta_livre()
+        servidores.append(_subir_no(blockchain, porta, TOKEN, peers_permitidos, caminho))
+        return f"http://127.0.0.1:{porta}"
+
+    yield _subir
+    for servidor in servidores:
+        servidor.should_exit = True
+
+
+def _cadeia(blocos, dificuldade=2, prefixo="t"):
+    blockchain = Blockchain(dificuldade=dificuldade)
+    for i in range(blocos):
+        blockchain.adicionar_bloco(f"{prefixo}{i}", "Seguro")
+    return blockchain
+
+
+def _http(url, corpo=None, token=TOKEN):
+    cabecalhos = {"X-Sync-Token": token} if token else {}
+    dados = None
+    if corpo is not None:
+        dados = json.dumps(corpo).encode()
+        cabecalhos["Content-Type"] = "application/json"
+    requisicao = urllib.request.Request(url, data=dados, headers=cabecalhos)
+    try:
+        with urllib.request.urlopen(requisicao) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _genesis_diferente(blockchain):
+    genesis = blockchain.cadeia[0]
+    genesis.timestamp = "2000-01-01 00:00:00"
+    genesis.hash = genesis.minerar_bloco(blockchain.dificuldade)
+    return blockchain
+
+
+def test_catch_up_em_lotes_paralelos(subir):
+    peer = _cadeia(60)
+    local = Blockchain(dificuldade=2)
+    url = subir(peer)
+
+    resultado = sincronizar_com_peer(local, url, lote=7, paralelismo=3)
+
+    assert resultado["sincronizado"]
+    assert resultado["blocos_descartados"] == 0
+    assert [b.hash for b in local.cadeia] == [b.hash for b in peer.cadeia]
+    assert local.verificar_integridade()
+
+
+def test_fork_com_mais_trabalho_substitui_e_informa_descartados(subir):
+    peer = _cadeia(10)
+    local = Blockchain(dificuldade=2)
+    for i in range(3):
+        local.adicionar_bloco(f"local{i}", "Seguro")
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert resultado["sincronizado"]
+    assert resultado["ancestral"] == 0
+    assert resultado["blocos_descartados"] == 3
+    assert local.cadeia[-1].hash == peer.cadeia[-1].hash
+
+
+def test_nos_criados_em_momentos_diferentes_compartilham_o_genesis(subir):
+    peer = _cadeia(5)
+    time.sleep(1.1)
+    local = Blockchain(dificuldade=2)
+    local.adicionar_bloco("registrada antes da sincronização", "Seguro")
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert resultado["sincronizado"]
+    assert resultado["ancestral"] == 0
+    assert resultado["blocos_descartados"] == 1
+    assert local.cadeia[0].hash == peer.cadeia[0].hash
+    assert local.cadeia[-1].hash == peer.cadeia[-1].hash
+
+
+def test_genesis_diferente_e_recusado_sem_flag(subir):
+    peer = _cadeia(5)
+    local = _genesis_diferente(Blockchain(dificuldade=2))
+    genesis = local.cadeia[0].hash
+    url = subir(peer)
+
+    resultado = sincronizar_com_peer(local, url)
+
+    assert resultado == {
+        "sincronizado": False,
+        "motivo": "Peer não compartilha o bloco gênese.",
+    }
+    assert [b.hash for b in local.cadeia] == [genesis]
+
+    resultado = sincronizar_com_peer(local, url, aceitar_outro_genesis=True)
+
+    assert resultado["ancestral"] == -1
+    assert resultado["blocos_descartados"] == 1
+    assert [b.hash for b in local.cadeia] == [b.hash for b in peer.cadeia]
+
+
+def test_segunda_sincronizacao_informa_ja_sincronizado(subir):
+    peer = _cadeia(5)
+    local = Blockchain(dificuldade=2)
+    url = subir(peer)
+    assert sincronizar_com_peer(local, url)["blocos_recebidos"] == 5
+
+    resultado = sincronizar_com_peer(local, url)
+
+    assert resultado["sincronizado"]
+    assert resultado["blocos_recebidos"] == 0
+    assert resultado["motivo"].startswith("Já sincronizado")
+    assert len(local.cadeia) == 6
+
+
+def test_peer_inacessivel_vira_motivo(subir):
+    local = Blockchain(dificuldade=2)
+
+    resultado = sincronizar_com_peer(local, f"http://127.0.0.1:{_porta_livre()}")
+
+    assert not resultado["sincronizado"]
+    assert "inacessível" in resultado["motivo"]
+
+
+def test_resposta_malformada_vira_motivo(subir, monkeypatch):
+    peer = _cadeia(5)
+    local = Blockchain(dificuldade=2)
+    requisitar = sincronizacao._requisitar
+
+    def sem_hash(url, *args, **kwargs):
+        resposta = requisitar(url, *args, **kwargs)
+        for cabecalho in resposta.get("cabecalhos", []):
+            del cabecalho["hash"]
+        return resposta
+
+    monkeypatch.setattr(sincronizacao, "_requisitar", sem_hash)
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert not resultado["sincronizado"]
+    assert "KeyError" in resultado["motivo"]
+    assert len(local.cadeia) == 1
+
+
+def test_fork_com_menos_trabalho_e_recusado(subir):
+    peer = _cadeia(3, prefixo="peer")
+    local = _cadeia(5, prefixo="local")
+    antes = [b.hash for b in local.cadeia]
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert not resultado["sincronizado"]
+    assert [b.hash for b in local.cadeia] == antes
+
+
+def test_cabecalhos_sem_ligacao_sao_recusados(subir):
+    peer = _cadeia(10)
+    peer.cadeia[5].hash_anterior = "0" * 64
+    local = Blockchain(dificuldade=2)
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert resultado == {
+        "sincronizado": False,
+        "motivo": "Cabeçalhos inválidos recebidos do peer.",
+    }
+    assert len(local.cadeia) == 1
+
+
+def test_cabecalhos_forjados_param_no_primeiro_lote(subir, monkeypatch):
+    # Hashes com zeros à esquerda, mas que não batem com o conteúdo do bloco
+    peer = _cadeia(40)
+    for i in range(1, len(peer.cadeia)):
+        peer.cadeia[i].hash_anterior = peer.cadeia[i - 1].hash
+        peer.cadeia[i].hash = f"00{i:062x}"
+    local = Blockchain(dificuldade=2)
+    pedidos = []
+    requisitar = sincronizacao._requisitar
+    monkeypatch.setattr(
+        sincronizacao,
+        "_requisitar",
+        lambda url, *a, **k: pedidos.append(url) or requisitar(url, *a, **k),
+    )
+
+    resultado = sincronizar_com_peer(local, subir(peer), lote=5, paralelismo=1)
+
+    assert not resultado["sincronizado"]
+    assert "não confere" in resultado["motivo"]
+    assert sum("/sync/blocos" in url for url in pedidos) == 1
+    assert len(local.cadeia) == 1
+
+
+def test_corpo_adulterado_e_recusado(subir):
+    peer = _cadeia(10)
+    peer.cadeia[7].transacao = "adulterada"
+    local = Blockchain(dificuldade=2)
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert resultado == {
+        "sincronizado": False,
+        "motivo": "Bloco 7 não confere com o cabeçalho.",
+    }
+    assert len(local.cadeia) == 1
+
+
+def test_peer_com_outra_dificuldade_e_recusado(subir):
+    peer = _cadeia(5, dificuldade=3)
+    local = Blockchain(dificuldade=2)
+
+    resultado = sincronizar_com_peer(local, subir(peer))
+
+    assert not resultado["sincronizado"]
+    assert len(local.cadeia) == 1
+
+
+def test_troca_confere_trabalho_de_novo_sob_a_trava():
+    peer = _cadeia(4)
+    local = Blockchain(dificuldade=2)
+    for i in range(6):
+        local.adicionar_bloco(f"registrada durante o download {i}", "Seguro")
+
+    with pytest.raises(ValueError, match="mais trabalho"):
+        local.substituir_a_partir_de(0, peer.cadeia[0].hash, peer.cadeia[1:])
+    assert len(local.cadeia) == 7
+
+
+def test_troca_espera_o_registro_em_andamento(monkeypatch):
+    peer = _cadeia(20)
+    local = Blockchain(dificuldade=2)
+    minerando, liberar = threading.Event(), threading.Event()
+    minerar = modulo_blockchain.Bloco.minerar_bloco
+
+    def minerar_pausado(bloco, dificuldade):
+        minerando.set()
+        liberar.wait(5)
+        return minerar(bloco, dificuldade)
+
+    monkeypatch.setattr(modulo_blockchain.Bloco, "minerar_bloco", minerar_pausado)
+    registro = threading.Thread(target=local.adicionar_bloco, args=("nova", "Seguro"))
+    registro.start()
+    assert minerando.wait(5)
+
+    descartados = []
+    troca = threading.Thread(
+        target=lambda: descartados.append(
+            local.substituir_a_partir_de(0, peer.cadeia[0].hash, peer.cadeia[1:])
+        )
+    )
+    troca.start()
+    troca.join(0.3)
+    assert troca.is_alive()  # a troca espera o bloco que está sendo minerado
+
+    liberar.set()
+    registro.join(5)
+    troca.join(5)
+
+    assert descartados == [1]
+    assert [b.hash for b in local.cadeia] == [b.hash for b in peer.cadeia]
+    assert local.verificar_integridade()
+
+
+def test_endpoints_exigem_token(subir):
+    url = subir(_cadeia(3))
+
+    assert _http(f"{url}/sync/blocos?inicio=1&fim=3", token=None)[0] == 401
+    assert _http(f"{url}/sync/blocos?inicio=1&fim=3", token="errado")[0] == 401
+    assert _http(f"{url}/sync/status", token="errado")[0] == 401
+    status, resposta = _http(f"{url}/sync/blocos?inicio=1&fim=3")
+    assert status == 200 and len(resposta["blocos"]) == 2
+
+
+def test_endpoint_sincronizar_exige_peer_autorizado_e_limites(subir):
+    peer = _cadeia(5)
+    url_peer = subir(peer)
+    local = Blockchain(dificuldade=2)
+    url_local = subir(local, peers_permitidos=[url_peer])
+    sincronizacao_local = f"{url_local}/sync/sincronizar"
+
+    assert _http(sincronizacao_local, {"url": "file:///etc/passwd"})[0] == 403
+    assert _http(sincronizacao_local, {"url": "http://127.0.0.1:1"})[0] == 403
+    assert _http(sincronizacao_local, {"url": url_peer, "lote": 0})[0] == 422
+    assert _http(sincronizacao_local, {"url": url_peer, "paralelismo": 10_000})[0] == 422
+    with pytest.raises(ValueError):
+        sincronizar_com_peer(local, "file:///etc/passwd")
+
+
+def test_endpoint_sincronizar_salva_a_cadeia(subir, tmp_path):
+    peer = _cadeia(5)
+    url_peer = subir(peer)
+    local = Blockchain(dificuldade=2)
+    caminho = tmp_path / "chain.json"
+    # Espaços como em SMARTFIN_PEERS="http://a, http://b"
+    url_local = subir(local, peers_permitidos=[f" {url_peer}/ "], caminho=str(caminho))
+
+    status, resultado = _http(f"{url_local}/sync/sincronizar", {"url": url_peer})
+
+    assert status == 200 and resultado["sincronizado"]
+    salva = json.loads(caminho.read_text(encoding="utf-8"))
+    assert [b["hash"] for b in salva] == [b.hash for b in peer.cadeia]